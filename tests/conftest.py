@@ -0,0 +1,55 @@
+###############################################################################
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+###############################################################################
+
+import sys
+import types
+
+
+def _stub(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def _not_available(*args, **kwargs):
+    raise NotImplementedError('not available in tests, monkeypatch instead')
+
+
+class BaseAbstractData:
+    pass
+
+
+# bufr2geojson needs ecCodes and UDUNITS-2 and wis2box is not installable
+# from PyPI, fall back to minimal stand-ins so the plugin logic can be tested
+try:
+    import bufr2geojson  # noqa
+except Exception:
+    _stub('bufr2geojson', transform=_not_available)
+
+try:
+    import wis2box.api  # noqa
+    import wis2box.data.base  # noqa
+except Exception:
+    _stub('wis2box')
+    _stub('wis2box.api', upsert_collection_item=_not_available)
+    _stub('wis2box.data')
+    _stub('wis2box.data.base', BaseAbstractData=BaseAbstractData)
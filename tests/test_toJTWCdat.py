@@ -0,0 +1,204 @@
+###############################################################################
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+###############################################################################
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pyproj = pytest.importorskip("pyproj")
+
+import toJTWCdat  # noqa: E402
+from toJTWCdat import BUFR2JTWC, _parse_iso  # noqa: E402
+
+LON = -60.5
+LAT = 15.25
+RADIUS = 120000.0
+PHENOMENON_TIME = "2023-06-01T00:00:00Z/2023-06-01T12:00:00Z"
+
+QUADRANTS = [(0.0, 90.0), (90.0, 180.0), (180.0, 270.0), (270.0, 0.0)]
+
+
+def baseline_ring(lon, lat, radius, bearing):
+    # polygon as constructed by the original per-bearing implementation
+    g = pyproj.Geod(ellps="WGS84")
+    b0, b1 = bearing
+    if b1 == 0:
+        b1 = 360
+    x = list(map(lambda b: g.fwd(lon, lat, b, radius)[0:2],
+                 np.arange(b0, b1 + 2.5, 2.5)))
+    x.insert(0, (lon, lat))
+    x.append((lon, lat))
+    return x
+
+
+def make_feature(name, value, metadata, subset=1):
+    metadata = [
+        {"name": "centre", "value": "ecmf", "units": None},
+        {"name": "storm_identifier", "value": "01L", "units": None}
+    ] + metadata
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [LON, LAT]},
+        "properties": {
+            "name": name,
+            "value": value,
+            "units": "Pa",
+            "subset": subset,
+            "wigos_station_identifier": "TC-01L",
+            "phenomenonTime": PHENOMENON_TIME,
+            "resultTime": "2023-06-01T00:00:00Z",
+            "metadata": metadata
+        }
+    }
+
+
+def make_radius(bearing, radius=RADIUS):
+    return make_feature(
+        "effective_radius_with_respect_to_wind_speeds_above_threshold",
+        radius,
+        [{"name": "bearing_or_azimuth", "value": bearing, "units": "deg"},
+         {"name": "wind_speed_threshold", "value": 17.5, "units": "m/s"}]
+    )
+
+
+@pytest.fixture
+def plugin():
+    plugin = BUFR2JTWC.__new__(BUFR2JTWC)
+    plugin.output_data = {}
+    plugin.topic_hierarchy = SimpleNamespace(dirpath="tc/ecmf",
+                                             dotpath="tc.ecmf")
+    plugin.as_bytes = lambda input_data: input_data
+    return plugin
+
+
+@pytest.mark.parametrize("bearing", QUADRANTS)
+def test_wind_polygon_matches_baseline(plugin, bearing):
+    feature = plugin.extract_wind_polygon(make_radius(list(bearing)))
+
+    assert feature["geometry"]["type"] == "Polygon"
+    ring = feature["geometry"]["coordinates"][0]
+    expected = baseline_ring(LON, LAT, RADIUS, bearing)
+    assert len(ring) == len(expected)
+    np.testing.assert_allclose(ring, expected)
+
+    props = feature["properties"]
+    assert props["name"] == "wind_speed_threshold"
+    assert props["value"] == 17.5
+    assert props["units"] == "m/s"
+    assert props["resultTime"] == "2023-06-01T00:00:00Z"
+    assert props["phenomenonTime"] == "2023-06-01T12:00:00Z"
+    assert [p["name"] for p in props["parameters"]] == [
+        "centre", "storm_identifier"]
+    assert "metadata" not in props
+
+
+@pytest.mark.parametrize("timestamp", [
+    "2023-06-01T12:34:56Z",
+    "2024-02-29T23:59:59Z",
+    "2023-6-1T1:2:3Z"
+])
+def test_parse_iso_matches_strptime(timestamp):
+    expected = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ")
+    assert _parse_iso(timestamp) == expected
+
+
+@pytest.mark.parametrize("timestamp", [
+    "2023-06-01Z",
+    "2023-06-01T12:00Z",
+    "20230601T120000Z",
+    "2023-06-01T12:00:00",
+    "2023-06-01T12:00:00+00:00",
+    "2023-13-01T00:00:00Z"
+])
+def test_parse_iso_rejects_other_layouts(timestamp):
+    with pytest.raises(ValueError):
+        _parse_iso(timestamp)
+
+
+def test_wind_polygon_does_not_modify_bearing(plugin):
+    bearing = [270.0, 0.0]
+    plugin.extract_wind_polygon(make_radius(bearing))
+    assert bearing == [270.0, 0.0]
+
+
+def test_transform_shared_bearing(plugin, monkeypatch):
+    # bufr2geojson qualifiers can be shared between features
+    shared_bearing = [270.0, 0.0]
+    collection = {
+        "1": {"geojson": make_radius(shared_bearing)},
+        "2": {"geojson": make_radius(shared_bearing)}
+    }
+    monkeypatch.setattr(toJTWCdat, "as_geojson",
+                        lambda data, serialize: iter([collection]))
+
+    assert plugin.transform(b"")
+    assert len(plugin.output_data) == 2
+    assert shared_bearing == [270.0, 0.0]
+
+
+def test_wind_polygon_zero_radius_keeps_point(plugin):
+    feature = plugin.extract_wind_polygon(make_radius([0.0, 90.0], 0))
+    assert feature["geometry"] == {"type": "Point",
+                                   "coordinates": [LON, LAT]}
+    assert feature["properties"]["value"] == 17.5
+
+
+def test_publish(plugin, monkeypatch):
+    calls = []
+    monkeypatch.setattr(toJTWCdat, "upsert_collection_item",
+                        lambda dotpath, items: calls.append((dotpath, items)))
+    plugin.output_data = {
+        "a": {"geojson": {"id": "a"}, "_meta": {}},
+        "b": {"geojson": None, "_meta": {}}
+    }
+
+    assert plugin.publish()
+    assert calls == [("tc.ecmf", [{"id": "a"}])]
+
+
+def test_transform_keys(plugin, monkeypatch):
+    collection = {
+        "1": {"geojson": make_feature(
+            "pressure_reduced_to_mean_sea_level", 98000.0, [])},
+        "2": {"geojson": make_feature(
+            "wind_speed_at10m", 30.0,
+            [{"name": "ensemble_member_number", "value": 5, "units": None}])},
+        "3": {"geojson": make_radius([270.0, 0.0])},
+        "4": {"geojson": make_radius([0.0, 90.0], 0)}
+    }
+    monkeypatch.setattr(toJTWCdat, "as_geojson",
+                        lambda data, serialize: iter([collection]))
+
+    assert plugin.transform(b"")
+
+    # identifiers keep the string form used to build {identifier}.{format}
+    prefix = "TC-01L-{}-2023-06-01 00:00:00-12-{}"
+    assert list(plugin.output_data) == [
+        prefix.format(1, 1), prefix.format(5, 2),
+        prefix.format(1, 3), prefix.format(1, 4)
+    ]
+    for item in plugin.output_data.values():
+        assert item["_meta"] == {
+            "data_date": "2023-06-01 00:00",
+            "relative_filepath": Path("2023-06-01") / "wis" / "tc/ecmf"
+        }
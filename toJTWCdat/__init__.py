@@ -19,13 +19,12 @@
 #
 ###############################################################################
 __version__ = "0.0.1"
-from copy import deepcopy
 from datetime import datetime
-import json
+from functools import lru_cache
 import logging
 from pathlib import Path
+import re
 import numpy as np
-from pyproj import Geod
 from typing import Union
 
 from bufr2geojson import transform as as_geojson
@@ -34,15 +33,79 @@ from wis2box.api import upsert_collection_item
 
 LOGGER = logging.getLogger(__name__)
 
-g = Geod(ellps="WGS84")
+_GEOD = None
+
+
+def _geod():
+    # pyproj is only needed for the wind radii polygons, create it on first use
+    global _GEOD
+    if _GEOD is None:
+        from pyproj import Geod
+        _GEOD = Geod(ellps="WGS84")
+    return _GEOD
+
 
 bearingToName = {
-    "0.0-90.0": "RAD1",
-    "90.0-180.0": "RAD2",
-    "180.0-270.0": "RAD3",
-    "270.0-0.0": "RAD4"
+    (0.0, 90.0): "RAD1",
+    (90.0, 180.0): "RAD2",
+    (180.0, 270.0): "RAD3",
+    (270.0, 0.0): "RAD4"
+}
+
+# feature name -> (component, extraction method). The component is not part
+# of the output_data key, for wind radii it is looked up in bearingToName
+# which only checks the bearing is one of the four quadrants
+_HANDLERS = {
+    "pressure_reduced_to_mean_sea_level": ("MSLP", "extract_MSLP"),
+    "wind_speed_at10m": ("Vmax", "extract_vmax"),
+    "effective_radius_with_respect_to_wind_speeds_above_threshold": (None, "extract_wind_polygon")  # noqa
 }
 
+# metadata parameters retained in the output features
+_KEEP_PARAMETERS = frozenset((
+    "centre", "generating_application", "storm_identifier", "long_storm_name",
+    "technique_for_making_up_initial_perturbations", "ensemble_member_number",
+    "ensemble_forecast_type", "meteorological_attribute_significance"
+))
+
+
+def _bearing_grid(b0, b1, step=2.5):
+    # bearings from b0 to b1 inclusive, linspace avoids the floating point
+    # overshoot of np.arange with a non-integer step
+    n = int(round((b1 - b0) / step))
+    return np.linspace(b0, b1, n + 1)
+
+
+# bearings (degrees) used to construct the wind radii polygon for each quadrant
+_BEARING_GRID = {
+    (0.0, 90.0): _bearing_grid(0.0, 90.0),
+    (90.0, 180.0): _bearing_grid(90.0, 180.0),
+    (180.0, 270.0): _bearing_grid(180.0, 270.0),
+    (270.0, 360.0): _bearing_grid(270.0, 360.0)
+}
+
+
+_ISO_TIMESTAMP = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}Z")  # noqa
+
+
+@lru_cache(maxsize=4096)
+def _parse_iso(timestamp):
+    # timestamps are of the form YYYY-MM-DDTHH:MM:SSZ, many features share
+    # the same value so cache the parsed result. fromisoformat accepts more
+    # layouts than the original format so only use it for exact matches
+    if _ISO_TIMESTAMP.fullmatch(timestamp):
+        try:
+            return datetime.fromisoformat(timestamp[:-1])
+        except ValueError:
+            pass
+    return datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ")
+
+
+def _index_metadata(metadata):
+    # index the metadata list by parameter name in a single pass
+    return {m['name']: m for m in metadata}
+
+
 class BUFR2JTWC(BaseAbstractData):
     """Model data"""
     def transform(self, input_data: Union[Path, bytes], filename: str = '') -> bool:
@@ -55,6 +118,10 @@ class BUFR2JTWC(BaseAbstractData):
 
         LOGGER.debug('Processing GeoJSON features')
 
+        # most features share the same date, cache the date string and
+        # filepath for each date
+        date_cache = {}
+
         for collection in results:
             # results is an iterator, for each iteration we have:
             # - dict['id']
@@ -63,171 +130,162 @@ class BUFR2JTWC(BaseAbstractData):
             count = 0
             for id, item in collection.items():
                 count += 1
+                gj = item['geojson']
+                props = gj['properties']
+                md = _index_metadata(props['metadata'])
                 # extract identification
                 # check if we have ensemble member number, if not use subset
-                subset = item['geojson']['properties']['subset']
-                for metadata in item['geojson']['properties']['metadata']:
-                    if metadata['name'] == "ensemble_member_number":
-                        subset = metadata['value']
-                stormIdentifier = item['geojson']['properties']['wigos_station_identifier']
-                stormName, stormNumber = stormIdentifier.split("-")
-                # now warning time and forecast (tau)
-                warningTime = item['geojson']['properties']['phenomenonTime']
-                forecastTime = None
-                tau = None
-                if "/" in warningTime:
-                    forecastTime, tau = warningTime.split("/")
+                if 'ensemble_member_number' in md:
+                    subset = md['ensemble_member_number']['value']
                 else:
-                    forecastTime = warningTime
-                    tau = item['geojson']['properties']['resultTime']
+                    subset = props['subset']
+                stormIdentifier = props['wigos_station_identifier']
+                # now warning time and forecast (tau)
+                warningTime = props['phenomenonTime']
+                forecastTime, sep, tau = warningTime.partition("/")
+                if not sep:
+                    tau = props['resultTime']
                 try:
-                    forecastTime = datetime.strptime(forecastTime,"%Y-%m-%dT%H:%M:%SZ")
-                    tau = datetime.strptime(tau,"%Y-%m-%dT%H:%M:%SZ")
+                    forecastTime = _parse_iso(forecastTime)
+                    tau = _parse_iso(tau)
                 except Exception as e:
-                    LOGGER.debug(f"Error setting time in geojson processing, error: {e}")
+                    LOGGER.debug("Error setting time in geojson processing, error: %s", e)
                 tau = int((tau - forecastTime).total_seconds() / 3600)
                 # now construct key for completing data.frame
                 #LOGGER.debug("extracting data")
                 key1 = f"{stormIdentifier}-{subset}-{forecastTime}-{tau}"
-                geojson_out = deepcopy(item['geojson'])
-                if geojson_out['properties']['name'] ==  "pressure_reduced_to_mean_sea_level":
-                    geojson_out = self.extract_MSLP(geojson_out)
-                    key2 = "MSLP"
-                elif geojson_out['properties']['name'] ==  "wind_speed_at10m":
-                    geojson_out = self.extract_vmax(geojson_out)
-                    key2 = "Vmax"
-                elif geojson_out['properties']['name'] ==  "effective_radius_with_respect_to_wind_speeds_above_threshold":
-                    bearing = None
-                    for metadata in geojson_out['properties']['metadata']:
-                        if metadata['name'] == "bearing_or_azimuth":
-                            bearing = metadata['value']
-                            bearing = f"{bearing[0]}-{bearing[1]}"
-                    assert bearing is not None
-                    geojson_out = self.extract_wind_polygon(geojson_out)
-                    key2 = bearingToName[bearing]
-                else:
-                    assert False
+                # no copy needed, the extract_* methods only modify the
+                # feature's own properties and geometry dicts, the (possibly
+                # shared) metadata entries are only read
+                geojson_out = gj
+                handler = _HANDLERS.get(props['name'])
+                assert handler is not None
+                key2, handler_name = handler
+                if key2 is None:
+                    # validates the quadrant, key2 is not used in the key
+                    assert 'bearing_or_azimuth' in md
+                    bearing = md['bearing_or_azimuth']['value']
+                    key2 = bearingToName[(bearing[0], bearing[1])]
+                geojson_out = getattr(self, handler_name)(geojson_out)
 
                 #LOGGER.debug("publishing")
                 data_date = forecastTime
+                cached = date_cache.get(data_date)
+                if cached is None:
+                    cached = (
+                        f"{data_date.year:04d}-{data_date.month:02d}-{data_date.day:02d} "  # noqa
+                        f"{data_date.hour:02d}:{data_date.minute:02d}",
+                        self.get_local_filepath(data_date))
+                    date_cache[data_date] = cached
+                date_str, filepath = cached
 
-                if f"{key1}-{count}" in self.output_data:
+                key = f"{key1}-{count}"
+                if key in self.output_data:
                     LOGGER.error("duplicate key found")
-                    LOGGER.error(f"Feature: {count}, key: {key1}-{count}")
+                    LOGGER.error(f"Feature: {count}, key: {key}")
                     assert False
 
-
-                self.output_data[f"{key1}-{count}"] = {
+                self.output_data[key] = {
                     'geojson': geojson_out, # json.dumps(geojson_out),
                     '_meta': {
-                        'data_date': data_date.strftime('%Y-%m-%d %H:%M'),
-                        'relative_filepath': self.get_local_filepath(data_date)
+                        'data_date': date_str,
+                        'relative_filepath': filepath
                     }
                 }
 
         LOGGER.debug('Successfully finished transforming BUFR data')
-        LOGGER.debug(f"{count} features processed")
+        LOGGER.debug("%s features processed", count)
         return True
 
     def get_local_filepath(self, date_):
-        yyyymmdd = date_.strftime('%Y-%m-%d')
+        yyyymmdd = f"{date_.year:04d}-{date_.month:02d}-{date_.day:02d}"
         return Path(yyyymmdd) / 'wis' / self.topic_hierarchy.dirpath
 
     def extract_vmax(self, feature):
-        keep = ("centre", "generating_application", "storm_identifier", "long_storm_name",
-                "technique_for_making_up_initial_perturbations", "ensemble_member_number", "ensemble_forecast_type",
-                "meteorological_attribute_significance")
-        parameters = feature['properties']['metadata']
+        props = feature['properties']
+        parameters = props['metadata']
         # drop unwanted / used parameters
-        feature['properties']['parameters'] = list()
-        for parameter in parameters:
-            if parameter['name'] in keep:
-                feature['properties']['parameters'].append(parameter)
-        del feature['properties']['metadata']
-        forecastTime = feature['properties']['phenomenonTime']
-        if "/" in forecastTime:
-            t1,t2 = forecastTime.split("/")
-        else:
-            t1 = forecastTime
-            t2 = feature['properties']['resultTime']
-        feature['properties']['resultTime'] = t1
-        feature['properties']['phenomenonTime'] = t2
+        props['parameters'] = [
+            p for p in parameters if p['name'] in _KEEP_PARAMETERS]
+        del props['metadata']
+        forecastTime = props['phenomenonTime']
+        t1, sep, t2 = forecastTime.partition("/")
+        if not sep:
+            t2 = props['resultTime']
+        props['resultTime'] = t1
+        props['phenomenonTime'] = t2
         return feature
 
     def extract_MSLP(self, feature):
-        keep = ("centre", "generating_application", "storm_identifier", "long_storm_name",
-                "technique_for_making_up_initial_perturbations", "ensemble_member_number", "ensemble_forecast_type",
-                "meteorological_attribute_significance")
-        parameters = feature['properties']['metadata']
+        props = feature['properties']
+        parameters = props['metadata']
         # drop unwanted / used parameters
-        feature['properties']['parameters'] = list()
-        for parameter in parameters:
-            if parameter['name'] in keep:
-                feature['properties']['parameters'].append(parameter)
-        del feature['properties']['metadata']
+        props['parameters'] = [
+            p for p in parameters if p['name'] in _KEEP_PARAMETERS]
+        del props['metadata']
         #LOGGER.debug("Extracting MSLP as GeoJSON")
-        forecastTime = feature['properties']['phenomenonTime']
-        if "/" in forecastTime:
-            t1,t2 = forecastTime.split("/")
-        else:
-            t1 = forecastTime
-            t2 = feature['properties']['resultTime']
-        feature['properties']['resultTime'] = t1
-        feature['properties']['phenomenonTime'] = t2
+        forecastTime = props['phenomenonTime']
+        t1, sep, t2 = forecastTime.partition("/")
+        if not sep:
+            t2 = props['resultTime']
+        props['resultTime'] = t1
+        props['phenomenonTime'] = t2
         return feature
 
     def extract_wind_polygon(self, feature):
-        keep = ("centre", "generating_application", "storm_identifier", "long_storm_name",
-                "technique_for_making_up_initial_perturbations", "ensemble_member_number", "ensemble_forecast_type",
-                "meteorological_attribute_significance")
+        props = feature['properties']
+        geometry = feature['geometry']
+        radius = props['value']
+        parameters = props['metadata']
+        lon = geometry['coordinates'][0]
+        lat = geometry['coordinates'][1]
 
-        radius = feature['properties']['value']
-        parameters = feature['properties']['metadata']
-        lon = feature['geometry']['coordinates'][0]
-        lat = feature['geometry']['coordinates'][1]
-
-        # get bearing
+        # get bearing, wind speed and parameters to keep in a single pass
         bearing = None
-        for parameter in parameters:
-            if parameter["name"] == "bearing_or_azimuth":
-                bearing = parameter["value"]
-        assert (bearing is not None)
-        if bearing[1] == 0:
-            bearing[1] = 360
-        # get wind speed
         wind_speed = None
         units = None
+        props['parameters'] = list()
         for parameter in parameters:
-            if parameter["name"] == "wind_speed_threshold":
+            if parameter["name"] == "bearing_or_azimuth":
+                bearing = parameter["value"]
+            elif parameter["name"] == "wind_speed_threshold":
                 wind_speed = parameter["value"]
                 units = parameter["units"]
+            elif parameter['name'] in _KEEP_PARAMETERS:
+                # drop unwanted / used parameters
+                props['parameters'].append(parameter)
+        assert (bearing is not None)
+        # use local copies so the bearing in the metadata is left untouched
+        b0, b1 = bearing
+        if b1 == 0:
+            b1 = 360.0
         assert (wind_speed is not None)
+        del props['metadata']
 
-        # drop unwanted / used parameters
-        feature['properties']['parameters'] = list()
-        for parameter in parameters:
-            if parameter['name'] in keep:
-                feature['properties']['parameters'].append(parameter)
-        del feature['properties']['metadata']
-
-        x = list(map(lambda b: g.fwd(lon, lat, b, radius)[0:2], np.arange(bearing[0], bearing[1] + 2.5, 2.5)))
-        x.insert(0, (lon, lat))
-        x.append((lon, lat))
+        # only construct the polygon if we have a non-zero radius, otherwise
+        # the point geometry is kept
         if radius > 0:
-            feature['geometry']['type'] = "Polygon"
-            feature['geometry']['coordinates'] = list()
-            feature['geometry']['coordinates'].insert(0, x)
-        feature['properties']['name'] = "wind_speed_threshold"
-        feature['properties']['value'] = wind_speed
-        feature['properties']['units'] = units
-        forecastTime = feature['properties']['phenomenonTime']
-        if "/" in forecastTime:
-            t1,t2 = forecastTime.split("/")
-        else:
-            t1 = forecastTime
-            t2 = feature['properties']['resultTime']
-        feature['properties']['resultTime'] = t1
-        feature['properties']['phenomenonTime'] = t2
+            # single vectorised call to pyproj rather than one call per bearing
+            bearings = _BEARING_GRID[(b0, b1)]
+            lons_in = np.full_like(bearings, lon)
+            lats_in = np.full_like(bearings, lat)
+            dists = np.full_like(bearings, radius)
+            fwd_lons, fwd_lats, _ = _geod().fwd(lons_in, lats_in, bearings, dists)
+            x = np.column_stack([fwd_lons, fwd_lats]).tolist()
+            x.insert(0, [lon, lat])
+            x.append([lon, lat])
+            geometry['type'] = "Polygon"
+            geometry['coordinates'] = list()
+            geometry['coordinates'].insert(0, x)
+        props['name'] = "wind_speed_threshold"
+        props['value'] = wind_speed
+        props['units'] = units
+        forecastTime = props['phenomenonTime']
+        t1, sep, t2 = forecastTime.partition("/")
+        if not sep:
+            t2 = props['resultTime']
+        props['resultTime'] = t1
+        props['phenomenonTime'] = t2
         return feature
 
     def list_test(self, items):
@@ -236,22 +294,15 @@ class BUFR2JTWC(BaseAbstractData):
 
     def publish(self) -> bool:
         LOGGER.info('Publishing output data')
-        upsert_list = []
-        for identifier, item in self.output_data.items():
-            # now iterate over formats
-            for format_, the_data in item.items():
-                if format_ == '_meta':  # not data, skip
-                    continue
-
-                #LOGGER.debug(f'Processing format: {format_}')
-                # check that we actually have data
-                if the_data is None:
-                    msg = f'Empty data for {identifier}-{format_}; not publishing'  # noqa
-                    LOGGER.warning(msg)
-                    continue
-                upsert_list.append(deepcopy(the_data))
+        # collect data for all formats, skipping metadata and empty data
+        upsert_list = [
+            the_data
+            for item in self.output_data.values()
+            for format_, the_data in item.items()
+            if format_ != '_meta' and the_data is not None
+        ]
         LOGGER.debug('Publishing data to API')
-        LOGGER.debug(f"{len(upsert_list)} items to publish")
+        LOGGER.debug("%s items to publish", len(upsert_list))
 
         upsert_collection_item(self.topic_hierarchy.dotpath, upsert_list)
 